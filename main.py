@@ -1,30 +1,15 @@
 import argparse
-import sys
 import csv
 import re
 import configparser
+import sqlite3
 from pathlib import Path
 
-try:
-    from tqdm import tqdm
-except ImportError:
-    def tqdm(iterable, *args, **kwargs):
-        total = kwargs.get('total', len(iterable) if hasattr(iterable, '__len__') else None)
-        desc = kwargs.get('desc', 'Processing')
-        for i, item in enumerate(iterable, 1):
-            if total:
-                sys.stdout.write(f"\r[INFO] {desc}: {i}/{total} ({(i / total) * 100:.1f}%)")
-            else:
-                sys.stdout.write(f"\r[INFO] {desc}: {i} items")
-            sys.stdout.flush()
-            yield item
-        print()
-
 from processors.identifier import LanguageIdentifier
 from processors.translator import LindatTranslator
-from utils import process_alto_xml, process_amcr_xml
+from processors.translation_cache import TranslationCache
+from utils import process_alto_xml, process_amcr_xml, load_xsd_schema
 import requests
-import tempfile
 
 
 def fetch_xml_from_url(url, download_dir):
@@ -38,8 +23,7 @@ def fetch_xml_from_url(url, download_dir):
         safe_name = "".join([c for c in doc_id if c.isalpha() or c.isdigit() or c in ('-', '_')]).rstrip()
         local_path = download_dir / f"{safe_name}.xml"
 
-        with open(local_path, 'wb') as f:
-            f.write(response.content)
+        local_path.write_bytes(response.content)
         return local_path
     except Exception as e:
         print(f"[ERROR] Failed to download {url}: {e}")
@@ -55,17 +39,19 @@ def parse_arguments():
     parser.add_argument("--alto", action="store_true")
     parser.add_argument("--xpaths", type=Path, default=None)
     parser.add_argument("--xsd", type=str, default=None)
+    parser.add_argument("--workers", type=int, default=LindatTranslator.MAX_WORKERS)
+    parser.add_argument("--cache", type=Path, default=None)
+    parser.add_argument("--api_url", type=str, default=LindatTranslator.BASE_URL)
 
     args = parser.parse_args()
 
     if args.config and args.config.exists():
         config = configparser.ConfigParser()
-        with open(args.config, 'r', encoding='utf-8') as f:
-            cleaned_lines = ['[DEFAULT]\n']
-            for line in f:
-                cleaned_line = re.sub(r'^\[.*?\]\s*', '', line.strip())
-                if cleaned_line and not cleaned_line.startswith('#'):
-                    cleaned_lines.append(cleaned_line + '\n')
+        cleaned_lines = ['[DEFAULT]\n']
+        for line in args.config.read_text(encoding='utf-8').splitlines():
+            cleaned_line = re.sub(r'^\[.*?\]\s*', '', line.strip())
+            if cleaned_line and not cleaned_line.startswith('#'):
+                cleaned_lines.append(cleaned_line + '\n')
 
         config.read_string(''.join(cleaned_lines))
         defaults = config['DEFAULT']
@@ -75,6 +61,15 @@ def parse_arguments():
         if 'source_lang' in defaults: args.source_lang = defaults['source_lang']
         if 'target_lang' in defaults: args.target_lang = defaults['target_lang']
         if 'fields' in defaults: args.xpaths = Path(defaults['fields'])
+        if 'workers' in defaults:
+            try:
+                args.workers = int(defaults['workers'])
+            except ValueError:
+                print(f"[WARN] Invalid workers value '{defaults['workers']}' in config. "
+                      f"Using {LindatTranslator.MAX_WORKERS}.")
+                args.workers = LindatTranslator.MAX_WORKERS
+        if 'cache' in defaults: args.cache = Path(defaults['cache'])
+        if 'api_url' in defaults: args.api_url = defaults['api_url']
 
     return args
 
@@ -108,15 +103,36 @@ def main():
         print("[ERROR] Specify either the --alto flag or provide --xpaths file in config.")
         return
 
-    translator = LindatTranslator()
+    if args.source_lang.lower() == args.target_lang.lower():
+        print(f"[WARN] Source and target language are both '{args.target_lang}'. Nothing to translate.")
+        return
+
+    # One persistent cache shared by every file in the batch (and by later runs)
+    cache = None
+    if args.cache:
+        try:
+            cache = TranslationCache(args.cache)
+            print(f"[INFO] Using translation cache: {args.cache}")
+        except (sqlite3.Error, OSError) as e:
+            print(f"[WARN] Could not open translation cache {args.cache}: {e}. Continuing without it.")
+
+    translator = LindatTranslator(max_workers=args.workers, cache=cache, base_url=args.api_url)
 
     # Initialize FastText Identifier ONLY if 'auto' is selected to save memory
     identifier = LanguageIdentifier() if args.source_lang == "auto" else None
 
+    # Compile the XSD schema once for the whole batch instead of re-downloading it per file
+    xsd_schema = None
+    if args.xsd and not args.alto:
+        try:
+            xsd_schema = load_xsd_schema(args.xsd)
+        except Exception as e:
+            print(f"[WARN] Failed to load XSD schema {args.xsd}: {e}. Outputs will not be validated.")
+
     xpaths_list = []
     if args.xpaths and args.xpaths.exists():
-        with open(args.xpaths, 'r', encoding='utf-8') as f:
-            xpaths_list = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        xpaths_list = [line.strip() for line in args.xpaths.read_text(encoding='utf-8').splitlines()
+                       if line.strip() and not line.startswith('#')]
 
     files_to_process = []
 
@@ -126,8 +142,8 @@ def main():
 
     if input_path.is_file() and input_path.suffix == '.txt':
         print("[INFO] Text file detected. Reading URLs...")
-        with open(input_path, 'r', encoding='utf-8') as f:
-            urls = [line.strip() for line in f if line.strip() and line.startswith('http')]
+        urls = [line.strip() for line in input_path.read_text(encoding='utf-8').splitlines()
+                if line.strip() and line.startswith('http')]
 
         for url in urls:
             print(f"[INFO] Downloading: {url}")
@@ -147,6 +163,9 @@ def main():
     out_dir = args.output if args.output else input_path.parent / f"translated_{args.target_lang}"
     if input_path.is_dir(): out_dir.mkdir(parents=True, exist_ok=True)
 
+    # Translations shared by all files, so boilerplate repeated across documents is sent only once
+    shared_cache = {}
+
     for i, file_path in enumerate(files_to_process, 1):
         print(f"\n[FILE {i}/{len(files_to_process)}] Processing: {file_path.name}")
         output_file = generate_output_path(file_path, out_dir, args, is_batch=input_path.is_dir())
@@ -160,13 +179,17 @@ def main():
             try:
                 if args.alto:
                     process_alto_xml(file_path, output_file, translator, args.source_lang, args.target_lang, csv_writer,
-                                     identifier)
+                                     identifier, shared_cache)
                 else:
                     process_amcr_xml(file_path, output_file, xpaths_list, translator, args.source_lang,
-                                     args.target_lang, args.xsd, csv_writer, identifier)
+                                     args.target_lang, xsd_schema, csv_writer, identifier, shared_cache)
             except Exception as e:
                 print(f"[ERROR] Failed processing {file_path.name}: {e}")
 
+    translator.close()
+    if cache:
+        cache.close()
+
     print(f"\n{'=' * 60}\n PROCESSING COMPLETE ".center(60, "=") + f"\n{'=' * 60}\n")
 
 
@@ -1,8 +1,28 @@
-import fasttext
-from huggingface_hub import hf_hub_download
+import functools
+
+
+@functools.lru_cache(maxsize=2)
+def _load_fasttext_model(repo_id, filename):
+    """
+    Downloads and loads a FastText model once per process; later LanguageIdentifier
+    instances share the already loaded model. The heavy imports happen here, so
+    runs that never identify languages do not pay for them.
+    """
+    import fasttext
+    from huggingface_hub import hf_hub_download
+
+    try:
+        # Use the locally cached copy without a network round-trip when it exists
+        model_path = hf_hub_download(repo_id=repo_id, filename=filename, local_files_only=True)
+    except Exception:
+        model_path = hf_hub_download(repo_id=repo_id, filename=filename)
+    return fasttext.load_model(model_path)
 
 
 class LanguageIdentifier:
+    MODEL_REPO = "facebook/fasttext-language-identification"
+    MODEL_FILE = "model.bin"
+
     # Map ISO 639-3 (FastText) to ISO 639-1 (Lindat)
     CODE_MAP = {
         'ces': 'cs', 'eng': 'en', 'fra': 'fr', 'deu': 'de',
@@ -12,14 +32,20 @@ class LanguageIdentifier:
         'spa': 'es', 'ita': 'it', 'nld': 'nl', 'hin': 'hi'
     }
 
+    # Number of candidate labels inspected when restricting predictions to CODE_MAP
+    TOP_K = 5
+    # Only the beginning of a text is used for detection
+    MAX_CHARS = 2000
+    _WHITESPACE_TRANS = str.maketrans({'\n': ' ', '\r': ' ', '\t': ' '})
+
     def __init__(self):
         """
         Initializes the LanguageIdentifier by downloading and loading
         the FastText language identification model from Hugging Face Hub.
+        The model is loaded at most once per process.
         """
         try:
-            model_path = hf_hub_download(repo_id="facebook/fasttext-language-identification", filename="model.bin")
-            self.model = fasttext.load_model(model_path)
+            self.model = _load_fasttext_model(self.MODEL_REPO, self.MODEL_FILE)
         except Exception as e:
             print(f"[ERROR] Failed to load FastText language model: {type(e).__name__} - {e}")
             self.model = None
@@ -28,6 +54,10 @@ class LanguageIdentifier:
         """
         Detects the language of the provided text. Normalizes text structure,
         queries the FastText model, and maps the ISO 639-3 result to ISO 639-1.
+        Only the languages listed in CODE_MAP are of interest, so the TOP_K best
+        labels are inspected and the first one from CODE_MAP wins with its own score.
+        This means an out-of-set language is reported as the closest supported profile;
+        if none of the candidates is supported, the top label is returned unmapped.
         Returns a tuple: (language_code, confidence_score).
         """
         if not self.model:
@@ -37,18 +67,55 @@ class LanguageIdentifier:
         if not text or not text.strip():
             return 'en', 0.0
 
-        # Lowercase for better detection
-        clean_text = text.replace('\n', ' ').lower()[:2000]
+        clean_text = self._normalize(text)
 
         try:
-            labels, scores = self.model.predict(clean_text)
+            labels, scores = self.model.predict(clean_text, k=self.TOP_K)
+            return self._pick_label(labels, scores)
+        except Exception as e:
+            print(f"[ERROR] Language detection prediction failed: {type(e).__name__} - {e}")
+            return 'en', 0.0
 
-            raw_label = labels[0].replace("__label__", "")
-            iso3_code = raw_label.split('_')[0]
-            lang_code = self.CODE_MAP.get(iso3_code, iso3_code)
+    def detect_batch(self, texts):
+        """
+        Detects the languages of a list of texts with a single FastText call.
+        Follows the same rules as detect() and returns a list of (language_code, confidence_score)
+        tuples in input order.
+        """
+        texts = list(texts)
+        if not self.model:
+            print("[WARN] Language identification model is not loaded. Defaulting to 'en'.")
+            return [('en', 0.0)] * len(texts)
+
+        results = [('en', 0.0)] * len(texts)
+        indices = [i for i, text in enumerate(texts) if text and text.strip()]
+        if not indices:
+            return results
+
+        clean_texts = [self._normalize(texts[i]) for i in indices]
 
-            score = scores[0]
-            return lang_code, score
+        try:
+            all_labels, all_scores = self.model.predict(clean_texts, k=self.TOP_K)
         except Exception as e:
             print(f"[ERROR] Language detection prediction failed: {type(e).__name__} - {e}")
-            return 'en', 0.0
\ No newline at end of file
+            return results
+
+        for i, labels, scores in zip(indices, all_labels, all_scores):
+            results[i] = self._pick_label(labels, scores)
+        return results
+
+    def _normalize(self, text):
+        """
+        Cuts the text to MAX_CHARS before any transformation, so long documents are not
+        copied in full, then flattens line breaks and lowercases for better detection.
+        """
+        return text[:self.MAX_CHARS].translate(self._WHITESPACE_TRANS).lower()
+
+    def _pick_label(self, labels, scores):
+        for label, score in zip(labels, scores):
+            iso3_code = label.replace("__label__", "").split('_')[0]
+            if iso3_code in self.CODE_MAP:
+                return self.CODE_MAP[iso3_code], score
+
+        iso3_code = labels[0].replace("__label__", "").split('_')[0]
+        return iso3_code, scores[0]
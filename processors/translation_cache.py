@@ -0,0 +1,60 @@
+import hashlib
+import sqlite3
+from pathlib import Path
+
+
+class TranslationCache:
+    # SQLite limits the number of bound parameters per statement
+    LOOKUP_CHUNK = 500
+
+    def __init__(self, db_path):
+        """
+        Opens (or creates) a persistent SQLite translation cache at db_path.
+        Translations are keyed by a hash of (model endpoint, source language, target language, text),
+        so identical texts are translated only once across files and runs, and translations from
+        one server or fallback model are never served for another.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS translations (key BLOB PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(text, model_url, src_lang, tgt_lang):
+        scoped = f"{model_url}|{src_lang}|{tgt_lang}|{text}"
+        return hashlib.blake2b(scoped.encode('utf-8'), digest_size=16).digest()
+
+    def get_many(self, texts, model_url, src_lang, tgt_lang):
+        """
+        Looks up the given texts for a model endpoint and returns a dict {text: translation}
+        of the cache hits.
+        """
+        keys = {self.make_key(text, model_url, src_lang, tgt_lang): text for text in texts}
+        key_list = list(keys)
+        hits = {}
+
+        for start in range(0, len(key_list), self.LOOKUP_CHUNK):
+            chunk = key_list[start:start + self.LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(f"SELECT key, value FROM translations WHERE key IN ({placeholders})", chunk)
+            for key, value in rows:
+                hits[keys[key]] = value
+
+        return hits
+
+    def put_many(self, pairs, model_url, src_lang, tgt_lang):
+        """
+        Stores (text, translation) pairs produced by the given model endpoint and language pair.
+        """
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO translations (key, value) VALUES (?, ?)",
+            [(self.make_key(text, model_url, src_lang, tgt_lang), translated) for text, translated in pairs]
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
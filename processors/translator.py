@@ -1,85 +1,363 @@
+import re
+import sys
+import threading
+import time
+import weakref
 import requests
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-try:
-    from tqdm import tqdm
-except ImportError:
-    def tqdm(iterable, *args, **kwargs):
-        for item in iterable:
-            yield item
+
+def _plain_progress(iterable, *args, **kwargs):
+    total = kwargs.get('total', len(iterable) if hasattr(iterable, '__len__') else None)
+    desc = kwargs.get('desc', 'Processing')
+    for i, item in enumerate(iterable, 1):
+        if total:
+            sys.stdout.write(f"\r[INFO] {desc}: {i}/{total} ({(i / total) * 100:.1f}%)")
+        else:
+            sys.stdout.write(f"\r[INFO] {desc}: {i} items")
+        sys.stdout.flush()
+        yield item
+    print()
+
+
+def tqdm(iterable, *args, **kwargs):
+    """
+    Wraps iterable in a tqdm progress bar. tqdm is imported on first use only, since
+    most calls never need a bar; without tqdm a plain text counter is printed instead.
+    """
+    try:
+        from tqdm import tqdm as tqdm_bar
+    except ImportError:
+        return _plain_progress(iterable, *args, **kwargs)
+    return tqdm_bar(iterable, *args, **kwargs)
 
 
 class LindatTranslator:
     BASE_URL = "https://lindat.mff.cuni.cz/services/translation/api/v2"
 
-    def __init__(self):
+    # Texts sent together by translate_batch() go one per line; the API translates input line
+    # by line, so the response is split back on newlines. Multi-line texts are never packed.
+    BATCH_SEPARATOR = "\n"
+    BATCH_MAX_ITEMS = 32
+    # Request size budget in UTF-8 bytes; a packed batch always fits into a single chunk
+    CHUNK_MAX_BYTES = 8000
+    # Boundaries tried in order when a text has to be chunked: paragraphs, sentence ends, whitespace
+    _CHUNK_BOUNDARIES = (re.compile(r'\n\s*\n'), re.compile(r'(?<=[.!?])\s+'), re.compile(r'\s+'))
+    # Number of batch requests kept in flight at once
+    MAX_WORKERS = 8
+    # Keep-alive connections held open to the API host, enough for every worker
+    POOL_SIZE = 32
+    # Number of recently translated chunks kept in memory by each instance
+    CHUNK_CACHE_SIZE = 4096
+    # Supported models per API base URL, shared by all instances: {base_url: (fetched_at, models)}
+    _models_cache = {}
+    MODELS_TTL = 3600  # seconds
+
+    def __init__(self, max_workers=MAX_WORKERS, cache=None, base_url=BASE_URL):
+        """
+        Connects to the LINDAT API and fetches the list of supported models.
+        base_url may point to a self-hosted instance of the LINDAT translation service.
+        An optional TranslationCache is consulted by translate_batch() before any request is sent.
+        """
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max(1, max_workers)
+        self.cache = cache
+        self._chunk_cache = OrderedDict()
+        self._chunk_cache_lock = threading.Lock()
+        # Caps in-flight requests at max_workers across batch and chunk dispatch, which nest
+        self._request_slots = threading.BoundedSemaphore(self.max_workers)
+        self._session = self._create_session()
+        # Closes the session when the translator is garbage collected or at exit; unlike an
+        # atexit hook it holds no reference to the translator itself
+        self._finalizer = weakref.finalize(self, self._session.close)
         self.supported_models = self._fetch_models()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Releases the pooled connections. Safe to call more than once.
+        """
+        self._finalizer()
+
+    def _create_session(self):
+        """
+        Builds a pooled keep-alive session so repeated requests skip the TCP/TLS handshake.
+        Rate limiting and transient server errors are retried with backoff (honouring Retry-After);
+        translation POSTs are idempotent.
+        """
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=frozenset({"GET", "POST"}), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.POOL_SIZE, self.max_workers),
+                              max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
     def _fetch_models(self):
+        """
+        Returns the list of models offered by the API. The list is fetched once per base URL
+        and reused by later instances for MODELS_TTL seconds; a failed fetch is not cached.
+        """
+        cached = self._models_cache.get(self.base_url)
+        if cached and time.monotonic() - cached[0] < self.MODELS_TTL:
+            return cached[1]
+
         try:
-            resp = requests.get(f"{self.BASE_URL}/models")
+            resp = self._session.get(f"{self.base_url}/models")
             resp.raise_for_status()
             data = resp.json()
 
             if isinstance(data, dict) and '_embedded' in data:
-                return [item['model'] for item in data['_embedded'].get('item', [])]
+                models = [item['model'] for item in data['_embedded'].get('item', [])]
             elif isinstance(data, list):
-                return data
-            return []
+                models = data
+            else:
+                models = []
+
+            LindatTranslator._models_cache[self.base_url] = (time.monotonic(), models)
+            return models
         except Exception as e:
             print(f"[WARN] Network error fetching models ({e}). Using default list.")
             return ["fr-en", "cs-en", "de-en", "uk-en", "ru-en", "pl-en"]
 
     def translate(self, text, src_lang, tgt_lang="en"):
+        return self._translate_checked(text, src_lang, tgt_lang)[1]
+
+    def _translate_checked(self, text, src_lang, tgt_lang):
+        """
+        Translates text and returns (ok, translation). ok is False if any request failed,
+        in which case the translation contains an error placeholder.
+        """
         if not text or not text.strip() or src_lang == tgt_lang:
-            return text
+            return True, text
+
+        url, params = self._resolve_model(src_lang, tgt_lang)
+
+        # Fast path: ALTO lines and packed batches nearly always fit into a single request
+        if len(text.encode('utf-8')) <= self.CHUNK_MAX_BYTES:
+            return self._translate_chunk(text, url, params)
+
+        chunks = self._chunk_text(text)
+
+        # Chunks are independent; the shared request slots keep the total in flight at max_workers
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            translated_chunks = executor.map(
+                lambda chunk: self._translate_chunk(chunk, url, params), chunks)
+            translated_chunks = list(tqdm(translated_chunks, total=len(chunks), desc="Translating chunks",
+                                          leave=False))
+
+        return (all(ok for ok, _ in translated_chunks),
+                "\n".join(translated for _, translated in translated_chunks))
 
+    def _resolve_model(self, src_lang, tgt_lang):
+        """
+        Returns the model endpoint url and src/tgt params actually used for a language pair.
+        Unsupported pairs fall back to the cs-en model.
+        """
         model_name = f"{src_lang}-{tgt_lang}"
 
         if self.supported_models and model_name not in self.supported_models:
-            model_name = f"cs-en"
+            model_name = "cs-en"
             src_lang = "cs"
             tgt_lang = "en"
 
+        return f"{self.base_url}/models/{model_name}", {"src": src_lang, "tgt": tgt_lang}
 
-        chunks = self._chunk_text(text)
-        translated_chunks = []
-        chunk_iter = tqdm(chunks, desc="Translating chunks", leave=False) if len(chunks) > 1 else chunks
-
-        for chunk in chunk_iter:
-            try:
-                response = requests.post(
-                    f"{self.BASE_URL}/models/{model_name}?src={src_lang}&tgt={tgt_lang}",
-                    data={"input_text": chunk}
-                )
-
-                if response.status_code == 200:
-                    response.encoding = 'utf-8'
-                    translated_chunks.append(response.text.strip())
-                else:
-                    error_msg = f"[Translation Failed: HTTP {response.status_code}]"
-                    print(error_msg)
-                    translated_chunks.append(error_msg)
-            except requests.exceptions.RequestException as e:
-                error_msg = f"[Network Error: {e}]"
-                print(error_msg)
-                translated_chunks.append(error_msg)
-
-        return "\n".join(translated_chunks)
-
-    def _chunk_text(self, text, chunk_size=4000):
-        """
-        Smart chunking that respects word boundaries by breaking at the nearest space.
+    def _translate_chunk(self, chunk, url, params):
         """
-        chunks = []
-        while len(text) > chunk_size:
-            split_idx = text.rfind(' ', 0, chunk_size)
-            if split_idx == -1:
-                split_idx = chunk_size  # Force split if no spaces exist (rare)
+        Translates a single chunk, answering repeated chunks (headers, footers, captions)
+        from an in-memory LRU cache. Returns (ok, translation) as _post_chunk() does;
+        failed requests are never cached.
+        """
+        key = (url, params["src"], params["tgt"], chunk)
+        with self._chunk_cache_lock:
+            if key in self._chunk_cache:
+                self._chunk_cache.move_to_end(key)
+                return True, self._chunk_cache[key]
 
-            chunks.append(text[:split_idx].strip())
-            text = text[split_idx:].strip()
+        ok, translated = self._post_chunk(chunk, url, params)
+        if ok:
+            with self._chunk_cache_lock:
+                self._chunk_cache[key] = translated
+                if len(self._chunk_cache) > self.CHUNK_CACHE_SIZE:
+                    self._chunk_cache.popitem(last=False)
 
-        if text:
-            chunks.append(text)
+        return ok, translated
+
+    def _post_chunk(self, chunk, url, params):
+        """
+        Sends a single chunk to the model endpoint url. Returns (True, translation) on success
+        and (False, error placeholder) on failure, so a translation that merely quotes a
+        placeholder is never mistaken for an error.
+        """
+        try:
+            with self._request_slots:
+                response = self._session.post(url, params=params, data={"input_text": chunk})
 
-        return chunks
\ No newline at end of file
+            if response.status_code == 200:
+                # LINDAT always answers in UTF-8, so decode the body directly
+                return True, response.content.decode('utf-8', 'replace').strip()
+
+            error_msg = f"[Translation Failed: HTTP {response.status_code}]"
+            print(error_msg)
+            return False, error_msg
+        except requests.exceptions.RequestException as e:
+            error_msg = f"[Network Error: {e}]"
+            print(error_msg)
+            return False, error_msg
+
+    def translate_batch(self, texts, src_lang, tgt_lang="en", with_status=False):
+        """
+        Translates a list of texts with as few API round-trips as possible.
+        Short texts are packed together (up to BATCH_MAX_ITEMS texts and CHUNK_MAX_BYTES
+        bytes per request), one text per line, and the response is split back on newlines.
+        Up to max_workers batches are in flight concurrently.
+        If a response does not split back into the expected number of lines, the batch
+        is halved and each half retried; a failed request fails all its texts. Texts found in the persistent cache
+        are not sent at all. Returns translations in input order, or (ok, translation) pairs
+        if with_status is set.
+        """
+        texts = list(texts)
+        if src_lang == tgt_lang:
+            return [(True, text) for text in texts] if with_status else texts
+
+        # Cache entries belong to the endpoint and model that actually produced them
+        url, params = self._resolve_model(src_lang, tgt_lang)
+        cache_scope = (url, params["src"], params["tgt"])
+
+        cached = self.cache.get_many(texts, *cache_scope) if self.cache else {}
+        misses = [text for text in texts if text not in cached]
+        if cached:
+            print(f"[INFO] {len(texts) - len(misses)}/{len(texts)} texts found in translation cache")
+
+        fresh = dict(zip(misses, self._translate_uncached(misses, src_lang, tgt_lang)))
+
+        if self.cache and fresh:
+            self.cache.put_many([(text, translated) for text, (ok, translated) in fresh.items() if ok],
+                                *cache_scope)
+
+        results = [(True, cached[text]) if text in cached else fresh[text] for text in texts]
+        return results if with_status else [translated for _, translated in results]
+
+    def _translate_uncached(self, texts, src_lang, tgt_lang):
+        batches = list(self._pack_batches(texts))
+        if not batches:
+            return []
+
+        results = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            batch_results = executor.map(lambda batch: self._translate_packed(batch, src_lang, tgt_lang), batches)
+            if len(batches) > 1:
+                # A single batch is already announced by the caller; don't import tqdm for it
+                batch_results = tqdm(batch_results, total=len(batches), desc="Translating batches", leave=False)
+
+            for parts in batch_results:
+                results.extend(parts)
+
+        return results
+
+    def _translate_packed(self, batch, src_lang, tgt_lang):
+        """
+        Sends one packed batch and splits the response back into (ok, translation) pairs.
+        A failed request is not retried text by text: its error placeholder is returned for
+        every text. A line-count mismatch bisects the batch, so one misbehaving text costs
+        O(log n) extra requests instead of n.
+        """
+        if len(batch) == 1:
+            return [self._translate_checked(batch[0], src_lang, tgt_lang)]
+
+        ok, translated = self._translate_checked(self.BATCH_SEPARATOR.join(batch), src_lang, tgt_lang)
+        if not ok:
+            return [(False, translated)] * len(batch)
+
+        parts = [(True, part.strip()) for part in translated.split(self.BATCH_SEPARATOR)]
+        if len(parts) == len(batch):
+            return parts
+
+        print(f"[WARN] Batch of {len(batch)} texts came back in {len(parts)} lines. Splitting it in half.")
+        middle = len(batch) // 2
+        return (self._translate_packed(batch[:middle], src_lang, tgt_lang) +
+                self._translate_packed(batch[middle:], src_lang, tgt_lang))
+
+    def _pack_batches(self, texts):
+        """
+        Greedily groups consecutive texts into batches bounded by item count and total UTF-8 size.
+        Blank texts and texts containing any line break (even a trailing one) would break the
+        line-based split, so they get a batch of their own, as do texts larger than the budget
+        (chunked by translate()).
+        """
+        separator_bytes = len(self.BATCH_SEPARATOR.encode('utf-8'))
+        batch, batch_bytes = [], 0
+        for text in texts:
+            if '\n' in text or '\r' in text or not text.strip():
+                if batch:
+                    yield batch
+                    batch, batch_bytes = [], 0
+                yield [text]
+                continue
+
+            cost = len(text.encode('utf-8')) + separator_bytes
+            if batch and (len(batch) >= self.BATCH_MAX_ITEMS or batch_bytes + cost > self.CHUNK_MAX_BYTES):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(text)
+            batch_bytes += cost
+
+        if batch:
+            yield batch
+
+    def _chunk_text(self, text, max_bytes=CHUNK_MAX_BYTES, level=0):
+        """
+        Smart chunking that keeps each chunk within max_bytes of UTF-8 (the API limit is on bytes,
+        not characters). Breaks at paragraph boundaries first, then at sentence ends, then at
+        spaces, so sentences are translated whole whenever possible. A single word longer than
+        the budget is force-split (rare).
+        """
+        text_bytes = len(text.encode('utf-8'))
+        if text_bytes <= max_bytes:
+            return [text] if text.strip() else []
+
+        if level == len(self._CHUNK_BOUNDARIES):
+            return self._force_split(text, max_bytes)
+
+        # Split into pieces that keep their trailing boundary, then pack them greedily
+        pieces, start = [], 0
+        for match in self._CHUNK_BOUNDARIES[level].finditer(text):
+            pieces.append(text[start:match.end()])
+            start = match.end()
+        pieces.append(text[start:])
+
+        chunks, current, current_bytes = [], "", 0
+        for piece in pieces:
+            piece_bytes = len(piece.encode('utf-8'))
+            if current and current_bytes + piece_bytes > max_bytes:
+                chunks.append(current.strip())
+                current, current_bytes = "", 0
+
+            if piece_bytes > max_bytes:
+                chunks.extend(self._chunk_text(piece.strip(), max_bytes, level + 1))
+            else:
+                current += piece
+                current_bytes += piece_bytes
+
+        if current.strip():
+            chunks.append(current.strip())
+
+        return [chunk for chunk in chunks if chunk]
+
+    def _force_split(self, text, max_bytes):
+        chunks = []
+        while text:
+            head = text.encode('utf-8')[:max_bytes].decode('utf-8', 'ignore')
+            chunks.append(head)
+            text = text[len(head):]
+        return chunks
@@ -1,20 +1,38 @@
-import re
-import xml.etree.ElementTree as ET
 from lxml import etree
+import functools
 import urllib.request
 import sys
 
+# Language detections at or below this confidence are not trusted
+MIN_DETECTION_CONFIDENCE = 0.2
+FALLBACK_SRC_LANG = "cs"
+
+
+@functools.lru_cache(maxsize=256)
+def _compiled_xpath(expression, namespaces=()):
+    """
+    Compiles an XPath expression once per (expression, namespaces) pair; namespaces is a
+    tuple of (prefix, uri) items so it can be used as a cache key. Reused across files.
+    """
+    return etree.XPath(expression, namespaces=dict(namespaces))
+
+
+def load_xsd_schema(xsd_url_or_path):
+    """
+    Downloads (or reads) and compiles an XSD schema once, so it can be reused for every file in a batch.
+    """
+    if xsd_url_or_path.startswith('http'):
+        req = urllib.request.Request(xsd_url_or_path, headers={'User-Agent': 'Mozilla/5.0'})
+        with urllib.request.urlopen(req) as f:
+            xmlschema_doc = etree.parse(f)
+    else:
+        xmlschema_doc = etree.parse(xsd_url_or_path)
+
+    return etree.XMLSchema(xmlschema_doc)
 
-def validate_xml_with_xsd(xml_tree, xsd_url_or_path):
-    try:
-        if xsd_url_or_path.startswith('http'):
-            req = urllib.request.Request(xsd_url_or_path, headers={'User-Agent': 'Mozilla/5.0'})
-            with urllib.request.urlopen(req) as f:
-                xmlschema_doc = etree.parse(f)
-        else:
-            xmlschema_doc = etree.parse(xsd_url_or_path)
 
-        xmlschema = etree.XMLSchema(xmlschema_doc)
+def validate_xml_with_xsd(xml_tree, xmlschema):
+    try:
         if xmlschema.validate(xml_tree):
             return True, ""
         else:
@@ -23,8 +41,61 @@ def validate_xml_with_xsd(xml_tree, xsd_url_or_path):
         return False, f"Validation script error: {str(e)}"
 
 
-def process_amcr_xml(input_path, output_path, xpaths, translator, src_lang, tgt_lang, xsd_url=None, csv_writer=None,
-                     identifier=None):
+def resolve_source_langs(texts, src_lang, identifier=None):
+    """
+    Returns the source language of each text. In "auto" mode all texts are identified
+    in one call; detections at or below MIN_DETECTION_CONFIDENCE fall back to FALLBACK_SRC_LANG.
+    """
+    if src_lang != "auto":
+        return [src_lang] * len(texts)
+    if not identifier:
+        return [FALLBACK_SRC_LANG] * len(texts)  # Fallback if identifier fails/is missing
+
+    return [detected_lang if conf > MIN_DETECTION_CONFIDENCE else FALLBACK_SRC_LANG
+            for detected_lang, conf in identifier.detect_batch(texts)]
+
+
+def translate_unique_texts(items, translator, tgt_lang, shared_cache=None):
+    """
+    Translates (src_lang, text) pairs, sending each distinct text only once and
+    grouping texts of the same source language into batched API calls.
+    Groups already in the target language are skipped without touching the translator.
+    If shared_cache (a dict kept across files) is given, texts already present in it are
+    not sent again and successful new translations are added to it.
+    Returns a dict mapping (src_lang, text) to its translation.
+    """
+    if shared_cache is None:
+        shared_cache = {}
+
+    translation_cache = {}
+    pending = {}
+    for src_lang, text in items:
+        key = (src_lang, text)
+        if key in shared_cache:
+            translation_cache[key] = shared_cache[key]
+        else:
+            pending.setdefault(src_lang, {}).setdefault(text, None)
+
+    for src_lang, texts in pending.items():
+        texts = list(texts)
+        if src_lang == tgt_lang:
+            # Nothing to translate, the whole group is passed through untouched
+            translation_cache.update(((src_lang, text), text) for text in texts)
+            continue
+
+        print(f"[INFO] Translating {len(texts)} unique text blocks ({src_lang} -> {tgt_lang})")
+        translated = translator.translate_batch(texts, src_lang, tgt_lang, with_status=True)
+
+        for text, (ok, translated_text) in zip(texts, translated):
+            translation_cache[(src_lang, text)] = translated_text
+            if ok:
+                shared_cache[(src_lang, text)] = translated_text
+
+    return translation_cache
+
+
+def process_amcr_xml(input_path, output_path, xpaths, translator, src_lang, tgt_lang, xsd_schema=None,
+                     csv_writer=None, identifier=None, shared_cache=None):
     try:
         tree = etree.parse(str(input_path))
         root = tree.getroot()
@@ -44,32 +115,38 @@ def process_amcr_xml(input_path, output_path, xpaths, translator, src_lang, tgt_
         if 'amcr' not in xpath_ns:
             xpath_ns['amcr'] = "http://amcr.aiscr.cz/ns/amcr"
 
+        # First pass: collect every non-empty target element
+        targets = []
+        ns_items = tuple(sorted(xpath_ns.items()))
         for xpath in xpaths:
             try:
-                elements = root.xpath(xpath, namespaces=xpath_ns)
+                elements = _compiled_xpath(xpath, ns_items)(root)
                 for elem in elements:
                     original_text = elem.text
                     if original_text and original_text.strip():
-                        # Determine actual source language
-                        actual_src_lang = src_lang
-                        if src_lang == "auto" and identifier:
-                            detected_lang, conf = identifier.detect(original_text)
-                            actual_src_lang = detected_lang if conf > 0.2 else "cs"
-                        elif src_lang == "auto":
-                            actual_src_lang = "cs"  # Fallback if identifier fails/is missing
-
-                        translated = translator.translate(original_text, actual_src_lang, tgt_lang)
-                        elem.text = translated
-
-                        if csv_writer:
-                            doc_name = input_path.name.split('.')[0]
-                            csv_writer.writerow([doc_name, "", xpath, original_text, translated])
-            except etree.XPathEvalError as e:
+                        targets.append((xpath, elem, original_text))
+            except etree.XPathError as e:
                 print(f"[WARN] Invalid XPath expression '{xpath}': {e}")
 
-        if xsd_url:
+        # Determine actual source languages, identifying all texts in one call
+        src_langs = resolve_source_langs([text for _, _, text in targets], src_lang, identifier)
+        targets = [target + (lang,) for target, lang in zip(targets, src_langs)]
+
+        translation_cache = translate_unique_texts(
+            [(lang, text) for _, _, text, lang in targets], translator, tgt_lang, shared_cache)
+
+        # Second pass: put translations back into the tree
+        doc_name = input_path.name.split('.')[0]
+        for xpath, elem, original_text, actual_src_lang in targets:
+            translated = translation_cache[(actual_src_lang, original_text)]
+            elem.text = translated
+
+            if csv_writer:
+                csv_writer.writerow([doc_name, "", xpath, original_text, translated])
+
+        if xsd_schema is not None:
             print(f"[INFO] Validating {output_path.name} against XSD...")
-            is_valid, error_log = validate_xml_with_xsd(tree, xsd_url)
+            is_valid, error_log = validate_xml_with_xsd(tree, xsd_schema)
             if not is_valid:
                 print(f"[WARN] XSD Validation failed for {output_path.name}:\n{error_log}")
             else:
@@ -82,57 +159,69 @@ def process_amcr_xml(input_path, output_path, xpaths, translator, src_lang, tgt_
         print(f"[ERROR] Failed to process AMCR XML {input_path}: {e}")
 
 
-def process_alto_xml(input_path, output_path, translator, src_lang, tgt_lang, csv_writer=None, identifier=None):
+def process_alto_xml(input_path, output_path, translator, src_lang, tgt_lang, csv_writer=None, identifier=None,
+                     shared_cache=None):
     try:
         tree = etree.parse(str(input_path))
         root = tree.getroot()
         nsmap = root.nsmap
         ns = {'alto': nsmap[None]} if None in nsmap else nsmap
-        pages = root.xpath('//alto:Page', namespaces=ns) if 'alto' in ns else root.xpath('//Page')
+        # Fully qualified tags let lxml match elements directly while walking the tree
+        ns_prefix = f"{{{ns['alto']}}}" if 'alto' in ns else ''
+        line_tag, string_tag = f'{ns_prefix}TextLine', f'{ns_prefix}String'
+        pages = list(root.iter(f'{ns_prefix}Page'))
 
+        # First pass: collect every non-empty text line with its String elements
+        lines = []
         for page_idx, page in enumerate(pages, 1):
-            text_lines = page.xpath('.//alto:TextLine', namespaces=ns) if 'alto' in ns else page.xpath('.//TextLine')
+            text_lines = list(page.iter(line_tag))
             total_lines = len(text_lines)
 
             for line_idx, line in enumerate(text_lines, 1):
-                sys.stdout.write(f"\r[INFO] Page {page_idx} | Processing text block: {line_idx}/{total_lines}")
+                sys.stdout.write(f"\r[INFO] Page {page_idx} | Collecting text lines: {line_idx}/{total_lines}")
                 sys.stdout.flush()
 
                 line_id = line.get('ID', str(line_idx))
-                strings = line.xpath('.//alto:String', namespaces=ns) if 'alto' in ns else line.xpath('.//String')
+                strings = list(line.iter(string_tag))
                 if not strings:
                     continue
 
-                line_text = " ".join([s.get('CONTENT', '') for s in strings if s.get('CONTENT')]).strip()
+                contents = [string_elem.get('CONTENT') for string_elem in strings]
+                line_text = " ".join([content for content in contents if content]).strip()
                 if not line_text:
                     continue
 
-                # Language Identification
-                actual_src_lang = src_lang
-                if src_lang == "auto" and identifier:
-                    detected_lang, _ = identifier.detect(line_text)
-                    actual_src_lang = detected_lang
+                lines.append((page_idx, line_id, line_text, strings))
 
-                translated_text = translator.translate(line_text, actual_src_lang, tgt_lang)
+            if total_lines > 0:
+                print()
 
-                if csv_writer:
-                    doc_name = input_path.name.split('.')[0]
-                    csv_writer.writerow([doc_name, page_idx, line_id, line_text, translated_text])
+        # Language Identification, all lines in one call
+        src_langs = resolve_source_langs([text for _, _, text, _ in lines], src_lang, identifier)
+        lines = [line + (lang,) for line, lang in zip(lines, src_langs)]
 
-                trans_words = translated_text.split()
-                num_strings = len(strings)
-                words_per_string = len(trans_words) // num_strings
-                remainder = len(trans_words) % num_strings
+        translation_cache = translate_unique_texts(
+            [(lang, text) for _, _, text, _, lang in lines], translator, tgt_lang, shared_cache)
 
-                word_idx = 0
-                for i, string_elem in enumerate(strings):
-                    count = words_per_string + (1 if i < remainder else 0)
-                    assigned_words = trans_words[word_idx: word_idx + count]
-                    word_idx += count
-                    string_elem.set('CONTENT', " ".join(assigned_words))
+        # Second pass: redistribute translated words across the original String elements
+        doc_name = input_path.name.split('.')[0]
+        for page_idx, line_id, line_text, strings, actual_src_lang in lines:
+            translated_text = translation_cache[(actual_src_lang, line_text)]
 
-            if total_lines > 0:
-                print()
+            if csv_writer:
+                csv_writer.writerow([doc_name, page_idx, line_id, line_text, translated_text])
+
+            trans_words = translated_text.split()
+            num_strings = len(strings)
+            words_per_string = len(trans_words) // num_strings
+            remainder = len(trans_words) % num_strings
+
+            word_idx = 0
+            for i, string_elem in enumerate(strings):
+                count = words_per_string + (1 if i < remainder else 0)
+                assigned_words = trans_words[word_idx: word_idx + count]
+                word_idx += count
+                string_elem.set('CONTENT', " ".join(assigned_words))
 
         tree.write(str(output_path), encoding='utf-8', xml_declaration=True)
         print(f"[SUCCESS] Saved ALTO translation to: {output_path}")